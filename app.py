@@ -1,14 +1,23 @@
 import os
-from flask import Flask, send_from_directory
+from flask import Flask, abort, request, send_file, send_from_directory
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Serve everything from the project root as "static"
-app = Flask(
-    __name__,
-    static_folder=BASE_DIR,
-    static_url_path=""
-)
+PRODUCTS_JSON = os.path.join(BASE_DIR, "products.json")
+PRODUCTS_JSON_GZ = os.path.join(BASE_DIR, "products.json.gz")
+PRODUCTS_NDJSON = os.path.join(BASE_DIR, "products.ndjson")
+PRODUCTS_NDJSON_GZ = os.path.join(BASE_DIR, "products.ndjson.gz")
+
+# Only the frontend and the files build_frontend_json.py writes are
+# served; the rest of the project root (products.db, scrape caches and
+# seen-item files, .git) stays private
+FRONTEND_FILES = {"index.html", "script.js", "style.css", "products_index.json"}
+
+app = Flask(__name__, static_folder=None)
+
+# Behind a front server that honours X-Sendfile (Apache mod_xsendfile,
+# lighttpd), let it send file bodies instead of streaming them through Python
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE") == "1"
 
 @app.route("/")
 def index():
@@ -16,7 +25,53 @@ def index():
     return send_from_directory(BASE_DIR, "index.html")
 
 
+@app.route("/<path:filename>")
+def frontend_file(filename):
+    if filename not in FRONTEND_FILES:
+        abort(404)
+    return send_from_directory(BASE_DIR, filename)
+
+
+def send_precompressed(path, gz_path, mimetype):
+    if not os.path.exists(path):
+        abort(404)
+
+    # Hand out the pre-gzipped copy from build_frontend_json.py when the
+    # client accepts it and it isn't older than the plain file
+    use_gz = (
+        "gzip" in request.accept_encodings
+        and os.path.exists(gz_path)
+        and os.path.getmtime(gz_path) >= os.path.getmtime(path)
+    )
+
+    # send_file streams from disk in constant memory, answers If-None-Match
+    # with 304, and goes through the WSGI server's sendfile() path when it
+    # has one (gunicorn does)
+    resp = send_file(
+        gz_path if use_gz else path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+    )
+    if use_gz:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
+@app.route("/products.json")
+def products_json():
+    return send_precompressed(PRODUCTS_JSON, PRODUCTS_JSON_GZ, "application/json")
+
+
+@app.route("/products.ndjson")
+def products_ndjson():
+    return send_precompressed(
+        PRODUCTS_NDJSON, PRODUCTS_NDJSON_GZ, "application/x-ndjson"
+    )
+
+
 if __name__ == "__main__":
+    # Development server only; see README for running under gunicorn
     port = int(os.getenv("PORT", "5000"))
     app.run(host="0.0.0.0", port=port, debug=True)
- 
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+grocery_queries.py
+
+Search terms shared by walmart_scraper.py and superstore_scraper.py.
+"""
+
+# dict.fromkeys drops accidental repeats while keeping the order
+GROCERY_QUERIES = tuple(dict.fromkeys([
+    # Dairy
+    "milk",
+    "skim milk",
+    "2% milk",
+    "3.25% milk",
+    "lactose free milk",
+    "cream",
+    "coffee cream",
+    "whipping cream",
+    "half and half",
+    "butter",
+    "margarine",
+    "cheddar cheese",
+    "mozzarella cheese",
+    "shredded cheese",
+    "cream cheese",
+    "cottage cheese",
+    "yogurt",
+    "greek yogurt",
+    "sour cream",
+    "ice cream",
+
+    # Eggs & breakfast
+    "eggs",
+    "egg whites",
+    "bacon",
+    "breakfast sausage",
+    "hash browns",
+
+    # Bakery
+    "white bread",
+    "whole wheat bread",
+    "bagels",
+    "english muffins",
+    "tortillas",
+    "naan",
+    "hamburger buns",
+    "hot dog buns",
+
+    # Pantry staples
+    "rice",
+    "brown rice",
+    "pasta",
+    "spaghetti",
+    "macaroni",
+    "flour",
+    "sugar",
+    "brown sugar",
+    "baking soda",
+    "baking powder",
+    "salt",
+    "black pepper",
+    "olive oil",
+    "canola oil",
+    "vegetable oil",
+    "vinegar",
+    "soy sauce",
+    "ketchup",
+    "mustard",
+    "mayonnaise",
+    "salad dressing",
+    "peanut butter",
+    "jam",
+    "honey",
+
+    # Canned & jarred
+    "canned soup",
+    "canned tomatoes",
+    "canned beans",
+    "canned tuna",
+    "canned salmon",
+    "pasta sauce",
+
+    # Frozen
+    "frozen vegetables",
+    "frozen fruit",
+    "frozen pizza",
+    "frozen fries",
+    "frozen chicken nuggets",
+
+    # Meat
+    "chicken breast",
+    "chicken thighs",
+    "whole chicken",
+    "ground beef",
+    "steak",
+    "pork chops",
+    "ground pork",
+    "ground turkey",
+    "ham",
+    "sausages",
+
+    # Produce
+    "apples",
+    "bananas",
+    "oranges",
+    "grapes",
+    "strawberries",
+    "blueberries",
+    "broccoli",
+    "cauliflower",
+    "carrots",
+    "onions",
+    "potatoes",
+    "sweet potatoes",
+    "lettuce",
+    "spinach",
+    "kale",
+    "tomatoes",
+    "cucumbers",
+    "bell peppers",
+
+    # Snacks
+    "potato chips",
+    "tortilla chips",
+    "popcorn",
+    "crackers",
+    "cookies",
+    "chocolate",
+    "granola bars",
+    "nuts",
+    "trail mix",
+
+    # Drinks
+    "coffee",
+    "instant coffee",
+    "tea",
+    "orange juice",
+    "apple juice",
+    "soft drinks",
+    "energy drinks",
+    "water",
+    "mineral water",
+    "bottled water",
+    "sparkling water",
+]))
+
+assert len(set(GROCERY_QUERIES)) == len(GROCERY_QUERIES)
@@ -0,0 +1,81 @@
+"""
+rate_limiter.py
+
+Adaptive request pacing shared by walmart_scraper.py and superstore_scraper.py.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe request pacer shared by all of a scraper's worker threads.
+
+    Hands out evenly spaced request slots at `rate` per second. When the
+    server pushes back the rate is halved (and, with Retry-After, every
+    slot waits until that time); after `recover_after` seconds of clean
+    responses it is raised again, up to `max_rate`.
+
+    A burst of push-back responses (one per in-flight request) counts as a
+    single push-back: the rate is halved at most once per `throttle_window`
+    seconds, or per slot at the current rate if that is longer.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        recover_after: float,
+        throttle_window: float = 2.0,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.recover_after = recover_after
+        self.throttle_window = throttle_window
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._last_change = time.monotonic()
+        self._last_throttle = float("-inf")
+
+    def wait(self) -> None:
+        """Block until this caller's request slot comes up."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def throttled(self, retry_after=None) -> None:
+        """Server said slow down (e.g. 429/503): halve the rate, honour Retry-After."""
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            # Other responses from the same burst were already counted
+            if now - self._last_throttle < max(self.throttle_window, 1.0 / self.rate):
+                return
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._last_change = now
+            self._last_throttle = now
+        print(f"Throttled by server; slowing to {self.rate:.2f} req/s")
+
+    def succeeded(self) -> None:
+        """Clean response: step the rate back up once things have been quiet."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate < self.max_rate and now - self._last_change >= self.recover_after:
+                self.rate = min(self.max_rate, self.rate * 1.5)
+                self._last_change = now
+
+
+def parse_retry_after(value):
+    """Retry-After in seconds, or None (HTTP-date form is ignored)."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
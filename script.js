@@ -714,15 +714,44 @@
 
   // ------- Init -------
 
+  // Prefer products.ndjson (one product per line) so items are parsed
+  // while the download is still in flight; fall back to products.json.
+  async function loadProducts() {
+    const res = await fetch("products.ndjson");
+    if (res.ok && res.body) {
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      const items = [];
+      let buffered = "";
+
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (line.trim()) items.push(normalizeProduct(JSON.parse(line)));
+        }
+      }
+
+      buffered += decoder.decode();
+      if (buffered.trim()) items.push(normalizeProduct(JSON.parse(buffered)));
+      return items;
+    }
+
+    const fallback = await fetch("products.json");
+    const data = await fallback.json();
+    const rawItems = Array.isArray(data.items) ? data.items : [];
+    return rawItems.map(normalizeProduct);
+  }
+
   async function init() {
     // Build the cart overlay HTML once
     createCartOverlay();
 
     try {
-      const res = await fetch("products.json");
-      const data = await res.json();
-      const rawItems = Array.isArray(data.items) ? data.items : [];
-      allProducts = rawItems.map(normalizeProduct);
+      allProducts = await loadProducts();
     } catch (err) {
       console.error("Failed to load products.json", err);
       searchSummary.textContent =
@@ -1,8 +1,15 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import requests
-import json
-import time
-import random
+from requests.adapters import HTTPAdapter
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+from grocery_queries import GROCERY_QUERIES
+from rate_limiter import RateLimiter, parse_retry_after
 
 # -------------- HTTP CONFIG -------------- #
 
@@ -14,167 +21,75 @@ HEADERS = {
 }
 
 TIMEOUT = 15
+
+# One keep-alive session shared by the query threads; the pool holds a
+# connection per thread so none of them waits on (or drops) a connection
 SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
 BASE_URL = "https://www.realcanadiansuperstore.ca"
 
 # -------------- CONFIG -------------- #
-SLEEP_MIN = 0.3
-SLEEP_MAX = 0.8
 MAX_PAGES = None  # None = unlimited
-QUERY_SLEEP_MIN = 1.0  # Sleep between queries
-QUERY_SLEEP_MAX = 2.0
-
-# Search queries to scrape
-GROCERY_QUERIES = [
-    # Dairy
-    "milk",
-    "skim milk",
-    "2% milk",
-    "3.25% milk",
-    "lactose free milk",
-    "cream",
-    "coffee cream",
-    "whipping cream",
-    "half and half",
-    "butter",
-    "margarine",
-    "cheddar cheese",
-    "mozzarella cheese",
-    "shredded cheese",
-    "cream cheese",
-    "cottage cheese",
-    "yogurt",
-    "greek yogurt",
-    "sour cream",
-    "ice cream",
-
-    # Eggs & breakfast
-    "eggs",
-    "egg whites",
-    "bacon",
-    "breakfast sausage",
-    "hash browns",
-
-    # Bakery
-    "white bread",
-    "whole wheat bread",
-    "bagels",
-    "english muffins",
-    "tortillas",
-    "naan",
-    "hamburger buns",
-    "hot dog buns",
-
-    # Pantry staples
-    "rice",
-    "brown rice",
-    "pasta",
-    "spaghetti",
-    "macaroni",
-    "flour",
-    "sugar",
-    "brown sugar",
-    "baking soda",
-    "baking powder",
-    "salt",
-    "black pepper",
-    "olive oil",
-    "canola oil",
-    "vegetable oil",
-    "vinegar",
-    "soy sauce",
-    "ketchup",
-    "mustard",
-    "mayonnaise",
-    "salad dressing",
-    "peanut butter",
-    "jam",
-    "honey",
-
-    # Canned & jarred
-    "canned soup",
-    "canned tomatoes",
-    "canned beans",
-    "canned tuna",
-    "canned salmon",
-    "pasta sauce",
-
-    # Frozen
-    "frozen vegetables",
-    "frozen fruit",
-    "frozen pizza",
-    "frozen fries",
-    "frozen chicken nuggets",
-
-    # Meat
-    "chicken breast",
-    "chicken thighs",
-    "whole chicken",
-    "ground beef",
-    "steak",
-    "pork chops",
-    "ground pork",
-    "ground turkey",
-    "ham",
-    "sausages",
-
-    # Produce
-    "apples",
-    "bananas",
-    "oranges",
-    "grapes",
-    "strawberries",
-    "blueberries",
-    "broccoli",
-    "cauliflower",
-    "carrots",
-    "onions",
-    "potatoes",
-    "sweet potatoes",
-    "lettuce",
-    "spinach",
-    "kale",
-    "tomatoes",
-    "cucumbers",
-    "bell peppers",
-
-    # Snacks
-    "potato chips",
-    "tortilla chips",
-    "popcorn",
-    "crackers",
-    "cookies",
-    "chocolate",
-    "granola bars",
-    "nuts",
-    "trail mix",
-
-    # Drinks
-    "coffee",
-    "instant coffee",
-    "tea",
-    "orange juice",
-    "apple juice",
-    "soft drinks",
-    "bottled water",
-    "sparkling water",
-]
+QUERY_WORKERS = 4  # Queries scraped at the same time (requests still go through LIMITER)
+
+# Request pacing shared by the query threads (requests per second). The rate
+# is halved when the site pushes back (403/429/503) and stepped back up after
+# RATE_RECOVER_AFTER seconds without push-back.
+RATE_START = 2.0
+RATE_MIN = 0.25
+RATE_MAX = 4.0
+RATE_RECOVER_AFTER = 60.0
+THROTTLE_STATUSES = (403, 429, 503)
+
+
+# Only the __NEXT_DATA__ script is read from search pages. It is pulled out
+# of the raw bytes with a regex; BeautifulSoup (restricted to that one tag)
+# is only the fallback if the markup ever stops matching.
+NEXT_DATA_RE = re.compile(
+    rb'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+NEXT_DATA_ONLY = SoupStrainer("script", id="__NEXT_DATA__")
 
 
 # -------------- HELPERS -------------- #
 
-def sleep_random():
-    """Random sleep between requests."""
-    time.sleep(random.uniform(SLEEP_MIN, SLEEP_MAX))
+LIMITER = RateLimiter(RATE_START, RATE_MIN, RATE_MAX, RATE_RECOVER_AFTER)
+
+
+def http_get(url):
+    """GET through the shared session, paced by LIMITER."""
+    LIMITER.wait()
+    response = SESSION.get(url, timeout=TIMEOUT)
+    
+    if response.status_code in THROTTLE_STATUSES:
+        LIMITER.throttled(parse_retry_after(response.headers.get("Retry-After")))
+    else:
+        LIMITER.succeeded()
+    
+    return response
+
 
+def find_next_data(content):
+    """Return the raw __NEXT_DATA__ JSON text from a page, or None."""
+    match = NEXT_DATA_RE.search(content)
+    if match and match.group(1).strip():
+        return match.group(1)
 
-def sleep_between_queries():
-    """Longer sleep between different search queries."""
-    time.sleep(random.uniform(QUERY_SLEEP_MIN, QUERY_SLEEP_MAX))
+    soup = BeautifulSoup(content, "lxml", parse_only=NEXT_DATA_ONLY)
+    script_tag = soup.find("script", id="__NEXT_DATA__")
+    if script_tag and script_tag.string:
+        return script_tag.string
+    return None
 
 
 def extract_products_from_json(json_data):
-    """Extract product data from __NEXT_DATA__ JSON."""
+    """
+    Extract product data from __NEXT_DATA__ JSON.
+
+    Returns (products, has_more); has_more is read from the components'
+    pagination in the same pass.
+    """
     try:
         # Navigate to the product data
         page_props = json_data.get("props", {}).get("pageProps", {})
@@ -185,6 +100,7 @@ def extract_products_from_json(json_data):
         sections = layout.get("sections", {})
         
         products = []
+        has_more = False
         
         # Look through all sections for product grids
         for section_name, section_data in sections.items():
@@ -197,6 +113,17 @@ def extract_products_from_json(json_data):
                 if not isinstance(component, dict):
                     continue
                 
+                # Non-grid components can have "data": null; skip those
+                comp_data = component.get("data") or {}
+                if not isinstance(comp_data, dict):
+                    continue
+                
+                # Any component may carry the pagination flag
+                if not has_more:
+                    pagination = comp_data.get("pagination") or {}
+                    if isinstance(pagination, dict):
+                        has_more = pagination.get("hasMore", False)
+                
                 comp_id = component.get("componentId", "")
                 
                 # Only process productGridComponent
@@ -204,67 +131,76 @@ def extract_products_from_json(json_data):
                     continue
                 
                 # The product data is directly in the component's data
-                comp_data = component.get("data", {})
                 product_tiles = comp_data.get("productTiles", [])
                 
                 if product_tiles:
                     products.extend(product_tiles)
         
-        return products
+        return products, has_more
         
     except Exception as e:
         print(f"Error extracting products from JSON: {e}")
         import traceback
         traceback.print_exc()
-        return []
+        return [], False
+
+
+def intern_str(value):
+    """sys.intern for strings, other values (None, numbers) unchanged."""
+    return sys.intern(value) if isinstance(value, str) else value
 
 
 def parse_product(product_data, search_query):
     """Parse a single product tile into a clean dict."""
     try:
-        # Basic info
+        # Bound once: every field below is a lookup on this tile
+        g = product_data.get
+        link = g("link")
+        
+        # Basic info. Low-cardinality values (brand, statuses, badges) are
+        # interned: main() keeps every product in all_products for the summary
         info = {
             "search_query": search_query,
-            "product_id": product_data.get("productId", ""),
-            "article_number": product_data.get("articleNumber", ""),
-            "brand": product_data.get("brand", ""),
-            "title": product_data.get("title", ""),
-            "description": product_data.get("description", ""),
-            "package_sizing": product_data.get("packageSizing", ""),
-            "link": BASE_URL + product_data.get("link", "") if product_data.get("link") else "",
+            "product_id": g("productId", ""),
+            "article_number": g("articleNumber", ""),
+            "brand": intern_str(g("brand", "")),
+            "title": g("title", ""),
+            "description": g("description", ""),
+            "package_sizing": g("packageSizing", ""),
+            "link": BASE_URL + link if link else "",
         }
         
         # Pricing
-        pricing = product_data.get("pricing", {})
+        pricing = g("pricing", {})
         if pricing:
             info["price"] = pricing.get("displayPrice", "")
             info["was_price"] = pricing.get("wasPrice", "")
             info["price_raw"] = pricing.get("price", "")
         
         # Deal info
-        deal = product_data.get("deal", {})
+        deal = g("deal", {})
         if deal:
-            info["deal_type"] = deal.get("type", "")
+            info["deal_type"] = intern_str(deal.get("type", ""))
             info["deal_text"] = deal.get("text", "")
             
         # Inventory
-        inventory = product_data.get("inventoryIndicator", {})
+        inventory = g("inventoryIndicator", {})
         if inventory:
-            info["inventory_status"] = inventory.get("text", "")
+            info["inventory_status"] = intern_str(inventory.get("text", ""))
             
         # Badge
-        badge = product_data.get("productBadge", {})
+        badge = g("productBadge", {})
         if badge:
-            info["badge"] = badge.get("text", "")
+            info["badge"] = intern_str(badge.get("text", ""))
             
         # Image
-        images = product_data.get("productImage", [])
+        images = g("productImage", [])
         if images:
             info["image_url"] = images[0].get("largeUrl", "")
         
         # Sponsored/offer type
-        info["offer_type"] = product_data.get("offerType", "")
-        info["is_sponsored"] = product_data.get("isSponsored", False)
+        info["offer_type"] = intern_str(g("offerType", ""))
+        info["is_sponsored"] = g("isSponsored", False)
         
         return info
         
@@ -273,8 +209,13 @@ def parse_product(product_data, search_query):
         return None
 
 
-def scrape_query(query, seen_product_ids):
-    """Scrape all products for a given search query."""
+def scrape_query(query, seen_product_ids, lock, out_file):
+    """
+    Scrape all products for a given search query.
+
+    Runs on a query worker thread; `lock` guards the shared seen_product_ids
+    and `out_file`, which each page's new products are appended to.
+    """
     
     query_products = []
     page = 1
@@ -292,32 +233,29 @@ def scrape_query(query, seen_product_ids):
         print(f"  Page {page}: {search_url}")
         
         try:
-            response = SESSION.get(search_url, headers=HEADERS, timeout=TIMEOUT)
+            response = http_get(search_url)
             response.raise_for_status()
             
         except requests.RequestException as e:
             print(f"    ✗ Error fetching page {page}: {e}")
             break
         
-        # Parse HTML
-        soup = BeautifulSoup(response.text, "html.parser")
-        
         # Find __NEXT_DATA__ script
-        script_tag = soup.find("script", id="__NEXT_DATA__")
+        next_data = find_next_data(response.content)
         
-        if not script_tag or not script_tag.string:
+        if not next_data:
             print(f"    ✗ No __NEXT_DATA__ found on page {page}")
             break
         
         # Parse JSON
         try:
-            json_data = json.loads(script_tag.string)
-        except json.JSONDecodeError as e:
+            json_data = orjson.loads(next_data)
+        except orjson.JSONDecodeError as e:
             print(f"    ✗ JSON decode error on page {page}: {e}")
             break
         
         # Extract products from JSON
-        products = extract_products_from_json(json_data)
+        products, has_more = extract_products_from_json(json_data)
         
         if not products:
             print(f"    ✗ No products found on page {page}")
@@ -327,53 +265,36 @@ def scrape_query(query, seen_product_ids):
         
         print(f"    Found {len(products)} products on page")
         
-        # Parse and collect unique products
+        # Parse and collect unique products (other queries share seen_product_ids)
         new_products = 0
-        for product_data in products:
-            product_id = product_data.get("productId", "")
-            
-            if product_id in seen_product_ids:
-                continue
+        with lock:
+            rows = bytearray()
+            for product_data in products:
+                product_id = product_data.get("productId", "")
+                
+                if product_id in seen_product_ids:
+                    continue
+                
+                parsed = parse_product(product_data, query)
+                if parsed:
+                    query_products.append(parsed)
+                    seen_product_ids.add(product_id)
+                    rows += orjson.dumps(parsed, option=orjson.OPT_APPEND_NEWLINE)
+                    new_products += 1
             
-            parsed = parse_product(product_data, query)
-            if parsed:
-                query_products.append(parsed)
-                seen_product_ids.add(product_id)
-                new_products += 1
+            # Each product is serialized once, as it's found; flush per page
+            if rows:
+                out_file.write(rows)
+                out_file.flush()
         
         print(f"    ✓ Added {new_products} new products")
         
         # Check if there are more pages
-        try:
-            page_props = json_data.get("props", {}).get("pageProps", {})
-            search_data = page_props.get("initialSearchData", {})
-            layout = search_data.get("layout", {})
-            sections = layout.get("sections", {})
-            
-            has_more = False
-            for section_data in sections.values():
-                if isinstance(section_data, dict):
-                    for component in section_data.get("components", []):
-                        if isinstance(component, dict):
-                            comp_data = component.get("data", {})
-                            pagination = comp_data.get("pagination", {})
-                            has_more = pagination.get("hasMore", False)
-                            if has_more:
-                                break
-                if has_more:
-                    break
-            
-            if not has_more:
-                print(f"    No more pages available")
-                break
-                
-        except Exception as e:
-            print(f"    Could not determine if more pages exist: {e}")
-            if new_products == 0:
-                break
+        if not has_more:
+            print(f"    No more pages available")
+            break
         
         page += 1
-        sleep_random()
     
     print(f"  Query complete: {len(query_products)} products for '{query}'")
     return query_products
@@ -393,26 +314,23 @@ def main():
     
     all_products = []
     seen_product_ids = set()
+    lock = threading.Lock()
     
-    # Scrape each query
-    for idx, query in enumerate(GROCERY_QUERIES, 1):
-        print(f"\n[Query {idx}/{len(GROCERY_QUERIES)}]")
-        
-        query_products = scrape_query(query, seen_product_ids)
-        all_products.extend(query_products)
+    # Products are appended as each page is scraped, so progress is on disk
+    # as it goes. Each run starts the file fresh (dedup is per run).
+    # Scrape QUERY_WORKERS queries at a time; map() hands results back in query order
+    with open(OUTPUT_FILE, "wb") as out_file, \
+            ThreadPoolExecutor(max_workers=QUERY_WORKERS) as executor:
+        results = executor.map(
+            lambda query: scrape_query(query, seen_product_ids, lock, out_file),
+            GROCERY_QUERIES,
+        )
         
-        print(f"  Running total: {len(all_products)} unique products")
-        
-        # Save progress after each query
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            for product in all_products:
-                f.write(json.dumps(product, ensure_ascii=False) + "\n")
-        
-        print(f"  ✓ Progress saved to {OUTPUT_FILE}")
-        
-        # Sleep between queries (except after the last one)
-        if idx < len(GROCERY_QUERIES):
-            sleep_between_queries()
+        for idx, (query, query_products) in enumerate(zip(GROCERY_QUERIES, results), 1):
+            print(f"\n[Query {idx}/{len(GROCERY_QUERIES)}] '{query}' done")
+            all_products.extend(query_products)
+            
+            print(f"  Running total: {len(all_products)} unique products")
     
     # Final summary
     print("\n" + "="*60)
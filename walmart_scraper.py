@@ -1,162 +1,100 @@
-from bs4 import BeautifulSoup
 import requests
-import json
-import time
-import random
-from urllib.parse import quote_plus
+import html
+import os
+import re
+import threading
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+from urllib.parse import quote_plus, urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import orjson
+
+from grocery_queries import GROCERY_QUERIES
+from rate_limiter import RateLimiter, parse_retry_after
 
 # -------------- HTTP CONFIG (session + headers) -------------- #
 
 HEADERS = {
-    "Accept": "*/*",
+    # HTML only; the product data is in the page itself
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
     "Accept-Encoding": "gzip, deflate, br",
     "Accept-Language": "en-US,en;q=0.9",
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36 OPR/123.0.0.0"
 }
 
 TIMEOUT = 10  # seconds
-SESSION = requests.Session()
-
-
-# -------------- SEARCH QUERIES -------------- #
-
-GROCERY_QUERIES = [
-    # Dairy
-    "milk",
-    "skim milk",
-    "2% milk",
-    "3.25% milk",
-    "lactose free milk",
-    "cream",
-    "coffee cream",
-    "whipping cream",
-    "half and half",
-    "butter",
-    "margarine",
-    "cheddar cheese",
-    "mozzarella cheese",
-    "shredded cheese",
-    "cream cheese",
-    "cottage cheese",
-    "yogurt",
-    "greek yogurt",
-    "sour cream",
-    "ice cream",
-
-    # Eggs & breakfast
-    "eggs",
-    "egg whites",
-    "bacon",
-    "breakfast sausage",
-    "hash browns",
-
-    # Bakery
-    "white bread",
-    "whole wheat bread",
-    "bagels",
-    "english muffins",
-    "tortillas",
-    "naan",
-    "hamburger buns",
-    "hot dog buns",
-
-    # Pantry staples
-    "rice",
-    "brown rice",
-    "pasta",
-    "spaghetti",
-    "macaroni",
-    "flour",
-    "sugar",
-    "brown sugar",
-    "baking soda",
-    "baking powder",
-    "salt",
-    "black pepper",
-    "olive oil",
-    "canola oil",
-    "vegetable oil",
-    "vinegar",
-    "soy sauce",
-    "ketchup",
-    "mustard",
-    "mayonnaise",
-    "salad dressing",
-    "peanut butter",
-    "jam",
-    "honey",
-
-    # Canned & jarred
-    "canned soup",
-    "canned tomatoes",
-    "canned beans",
-    "canned tuna",
-    "canned salmon",
-    "pasta sauce",
-
-    # Frozen
-    "frozen vegetables",
-    "frozen fruit",
-    "frozen pizza",
-    "frozen fries",
-    "frozen chicken nuggets",
-
-    # Meat
-    "chicken breast",
-    "chicken thighs",
-    "whole chicken",
-    "ground beef",
-    "steak",
-    "pork chops",
-    "ground pork",
-    "ground turkey",
-    "ham",
-    "sausages",
-
-    # Produce
-    "apples",
-    "bananas",
-    "oranges",
-    "grapes",
-    "strawberries",
-    "blueberries",
-    "broccoli",
-    "cauliflower",
-    "carrots",
-    "onions",
-    "potatoes",
-    "sweet potatoes",
-    "lettuce",
-    "spinach",
-    "kale",
-    "tomatoes",
-    "cucumbers",
-    "bell peppers",
-
-    # Snacks
-    "potato chips",
-    "tortilla chips",
-    "popcorn",
-    "crackers",
-    "cookies",
-    "chocolate",
-    "granola bars",
-    "nuts",
-    "trail mix",
-
-    # Drinks
-    "coffee",
-    "instant coffee",
-    "tea",
-    "orange juice",
-    "apple juice",
-    "soft drinks",
-    "energy drinks",
-    "water",
-    "mineral water",
-    "bottled water",
-    "sparkling water",
-]
+
+HOME_URL = "https://www.walmart.ca/"
+SEARCH_URL = "https://www.walmart.ca/en/search?q={q}"
+
+# Bot checks redirect here and answer 200 with a challenge page
+BLOCK_PATH = "/blocked"
+
+# Set WALMART_HTTP_CACHE=1 while iterating on the scraper to serve repeat
+# GETs from a local SQLite cache instead of the network
+# (needs `pip install requests-cache`).
+HTTP_CACHE = os.getenv("WALMART_HTTP_CACHE") == "1"
+HTTP_CACHE_EXPIRE = 3600  # seconds
+
+# One pooled session shared by every worker thread: keep-alive connections
+# are reused instead of paying a TCP/TLS handshake per request.
+if HTTP_CACHE:
+    from requests_cache import CachedSession
+
+    SESSION = CachedSession(
+        "walmart_cache",
+        backend="sqlite",
+        expire_after=HTTP_CACHE_EXPIRE,
+        allowable_methods=("GET",),
+        cache_control=True,
+    )
+else:
+    SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+# Transient failures (dropped connections, 500/502/504) are retried inside
+# urllib3 with exponential backoff (0.5s, 1s, 2s, ...) instead of costing the
+# URL a whole retry round. 429/503 are left to LIMITER, which slows down;
+# urllib3 would otherwise retry them itself whenever they carry Retry-After.
+RETRY_POLICY = Retry(
+    total=4,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=RETRY_POLICY),
+)
+
+
+# Pages are scanned as raw bytes instead of building a DOM with BeautifulSoup:
+# we only ever need one <script> tag and the product hrefs.
+_NEXT_DATA_RE = re.compile(
+    rb'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+_PRODUCT_HREF_RE = re.compile(rb'href="([^"]*/ip[^"]*)"')
+
+# Product pages are streamed: HTML ahead of the __NEXT_DATA__ script is
+# dropped as it arrives, keeping only a short tail in case the script's
+# opening tag straddles two chunks.
+STREAM_CHUNK_SIZE = 64 * 1024
+_NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+_STREAM_TAIL = 1024
+
+# Shared default for missing nested objects; only ever read, never mutated
+_EMPTY = {}
+
+# Required product fields, read in one C-level call per product page
+_get_product_core = itemgetter("usItemId", "name", "availabilityStatus")
+
+# Product URLs end in the item id (/en/ip/<slug>/<id>); dedup keys on it
+_ITEM_ID_RE = re.compile(r"/ip/(?:[^?#]*/)?([0-9A-Za-z]+)(?:[?#]|$)")
 
 
 # -------------- SPEED / LIMIT CONFIG -------------- #
@@ -172,213 +110,514 @@ MAX_PRODUCTS_PER_QUERY = None
 # Max times to retry a *product URL* before giving up on it entirely
 MAX_PRODUCT_RETRIES = 3
 
-# Sleep ranges (seconds) – keep non-zero to avoid insta-ban
-SLEEP_PRODUCT_MIN = 0.2
-SLEEP_PRODUCT_MAX = 0.6
-SLEEP_PAGE_MIN = 0.4
-SLEEP_PAGE_MAX = 1.2
-
-# Only run a slice of queries (by index) to split runs:
+# How many product pages to fetch concurrently (shared by all queries)
+MAX_WORKERS = 16
+
+# How many queries to work on at once; their search-page fetches overlap
+# with each other's product fetches
+QUERY_WORKERS = 4
+
+# Request pacing shared by every worker (requests per second). The rate is
+# halved whenever Walmart pushes back (THROTTLE_STATUSES or a redirect to
+# the block page) and stepped back up after RATE_RECOVER_AFTER seconds of
+# pages that parsed.
+RATE_START = 2.0
+RATE_MIN = 0.5
+RATE_MAX = 3.0
+RATE_RECOVER_AFTER = 60.0
+THROTTLE_STATUSES = (403, 429, 503)
+
+# Item ids already scraped today, one per line. A restarted scrape on the
+# same (UTC) day skips products it already has; a new day gets a new file,
+# so every product is re-scraped once per day and jsonl_to_sqlite (which
+# keeps one price row per item per day) still sees fresh prices.
+SEEN_FILE = f"seen_items_{datetime.now(timezone.utc):%Y-%m-%d}.txt"
+
+# Only run a slice of queries (by index) to split runs;
+# QUERY_END = None runs through the end of the list:
 QUERY_START = 0
-QUERY_END = len(GROCERY_QUERIES)
+QUERY_END = None
 
 
 # -------------- HELPERS -------------- #
 
-def sleep_between(low: float, high: float) -> None:
-    """Randomized short sleep between actions."""
-    time.sleep(random.uniform(low, high))
+LIMITER = RateLimiter(RATE_START, RATE_MIN, RATE_MAX, RATE_RECOVER_AFTER)
 
 
-def get_product_links(query: str, page_number: int = 1):
-    """Fetch product links for a search query + page, skipping tracking/ad URLs."""
-    encoded_query = quote_plus(query)
-    search_url = f"https://www.walmart.ca/en/search?q={encoded_query}&page={page_number}"
+def warm_up_session() -> None:
+    """
+    HEAD the home page once before the workers start, so the first
+    connection (TCP + TLS) and any session cookies are already in place.
+    """
+    LIMITER.wait()
+    try:
+        SESSION.head(HOME_URL, timeout=TIMEOUT, allow_redirects=True)
+    except requests.RequestException as e:
+        print(f"Warm-up request failed ({e}); continuing without it")
 
-    resp = SESSION.get(search_url, headers=HEADERS, timeout=TIMEOUT)
-    resp.raise_for_status()
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    links = soup.find_all("a", href=True)
+def http_get(url: str, stream: bool = False):
+    """
+    GET through the shared session, paced by LIMITER.
+
+    Push-back (THROTTLE_STATUSES, or a redirect to the block page) slows
+    LIMITER down; a block page is raised as an HTTPError, since its 200
+    carries no data. Callers report pages that parsed via page_parsed().
+
+    With WALMART_HTTP_CACHE=1, cached URLs are answered locally, so they
+    skip the pacing and don't count towards the adaptive rate.
+    """
+    if HTTP_CACHE and SESSION.cache.contains(url=url):
+        resp = SESSION.get(url, timeout=TIMEOUT, stream=stream)
+        cached = getattr(resp, "from_cache", False)
+    else:
+        LIMITER.wait()
+        resp = SESSION.get(url, timeout=TIMEOUT, stream=stream)
+        cached = False
+
+    blocked = urlsplit(resp.url).path.startswith(BLOCK_PATH)
+    if not cached and (blocked or resp.status_code in THROTTLE_STATUSES):
+        LIMITER.throttled(parse_retry_after(resp.headers.get("Retry-After")))
+
+    if blocked:
+        resp.close()
+        raise requests.HTTPError(f"Redirected to block page for {url}")
+
+    return resp
+
+
+def page_parsed(resp) -> None:
+    """Count a page that yielded data as a clean response for LIMITER."""
+    if not getattr(resp, "from_cache", False):
+        LIMITER.succeeded()
+
+
+def item_key(product_url: str) -> str:
+    """Dedup key for a product URL: its item id, or the URL if none is found."""
+    match = _ITEM_ID_RE.search(product_url)
+    return match.group(1) if match else product_url
+
+
+def canonical_product_url(product_url: str) -> str:
+    """Drop the query string/fragment (tracking params like ?classType=...&athbdg=...)."""
+    return product_url.split("#", 1)[0].split("?", 1)[0]
+
+
+def load_seen_ids(path: str) -> set[str]:
+    """Read item ids recorded in SEEN_FILE by earlier runs today."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def links_from_search_data(content: bytes):
+    """
+    Product URLs from the search page's own __NEXT_DATA__ result set
+    (initialData.searchResult.itemStacks[*].items[*].canonicalUrl).
+
+    Returns None if the page doesn't carry that structure, so the caller
+    can fall back to scanning hrefs.
+    """
+    match = _NEXT_DATA_RE.search(content)
+    if not match:
+        return None
+
+    try:
+        data = orjson.loads(match.group(1))
+    except orjson.JSONDecodeError:
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    page_props = (data.get("props") or {}).get("pageProps") or {}
+    search_result = (page_props.get("initialData") or {}).get("searchResult")
+    if not isinstance(search_result, dict):
+        return None
 
     product_links = []
+    stacks = search_result.get("itemStacks") or []
+    if not isinstance(stacks, list):
+        return None
+
+    # Skip malformed entries rather than failing the whole page
+    for stack in stacks:
+        items = stack.get("items") if isinstance(stack, dict) else None
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            url = item.get("canonicalUrl")
+            if not isinstance(url, str) or "/ip/" not in url:
+                continue  # ads / placeholder tiles
+            product_links.append(url if url.startswith("http") else "https://www.walmart.ca" + url)
 
-    for link in links:
-        href = link["href"]
+    # Stacks can repeat an item (e.g. a sponsored slot and a regular one)
+    return list(dict.fromkeys(product_links))
+
+
+def links_from_hrefs(content: bytes):
+    """Fallback: unique product links from the page's <a href> values."""
+    product_links = []
+    seen_hrefs = set()
+
+    for match in _PRODUCT_HREF_RE.finditer(content):
+        raw_href = match.group(1)
+
+        # Each product card links to its page several times (image, title, ...)
+        if raw_href in seen_hrefs:
+            continue
+        seen_hrefs.add(raw_href)
 
         # Skip tracking/ad links like /wapcrs/track...
-        if "wapcrs/track" in href:
+        if b"wapcrs/track" in raw_href:
             continue
 
-        if "/ip" in href:
-            if href.startswith("http"):
-                full_url = href
-            else:
-                full_url = "https://www.walmart.ca" + href
-            product_links.append(full_url)
+        # Attribute values are HTML-escaped (&amp; etc.)
+        href = html.unescape(raw_href.decode("utf-8", "replace"))
+
+        if href.startswith("http"):
+            full_url = href
+        else:
+            full_url = "https://www.walmart.ca" + href
+        product_links.append(full_url)
 
     return product_links
 
 
-def extract_product_info(product_url: str):
-    """Extract product data from a Walmart product page using __NEXT_DATA__ JSON."""
-    resp = SESSION.get(product_url, headers=HEADERS, timeout=TIMEOUT)
+def search_base_url(query: str) -> str:
+    """Search URL for a query without the page number (quoted once per query)."""
+    return SEARCH_URL.format(q=quote_plus(query))
+
+
+def get_product_links(search_base: str, page_number: int = 1):
+    """
+    Fetch unique product links for one search page, skipping tracking/ad URLs.
+
+    `search_base` comes from search_base_url(query).
+    """
+    resp = http_get(f"{search_base}&page={page_number}")
     resp.raise_for_status()
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    script_tag = soup.find("script", id="__NEXT_DATA__")
+    # The result set is embedded as JSON; only scan anchors if it's missing
+    product_links = links_from_search_data(resp.content)
+    if product_links is None:
+        product_links = links_from_hrefs(resp.content)
+    if product_links:
+        page_parsed(resp)
+
+    # Tracking variants of the same product URL collapse to one fetch, and
+    # retry/give-up bookkeeping is per product rather than per variant
+    return list(dict.fromkeys(canonical_product_url(url) for url in product_links))
+
+
+def read_next_data(resp) -> bytearray:
+    """
+    Stream a page body, keeping it only from (just before) the __NEXT_DATA__
+    script through its closing tag.
+
+    The rest of the body is still read and discarded, so the keep-alive
+    connection goes back to the pool instead of being dropped.
+    """
+    buf = bytearray()
+    script_at = -1
+    scan_from = 0
+    chunks = resp.iter_content(STREAM_CHUNK_SIZE)
+
+    for chunk in chunks:
+        buf += chunk
+
+        if script_at < 0:
+            script_at = buf.find(_NEXT_DATA_MARKER, scan_from)
+            if script_at < 0:
+                del buf[:-_STREAM_TAIL]
+                scan_from = max(0, len(buf) - len(_NEXT_DATA_MARKER))
+                continue
+            keep_from = max(0, script_at - _STREAM_TAIL)
+            del buf[:keep_from]
+            script_at -= keep_from
+            scan_from = script_at
+
+        end = buf.find(b"</script>", scan_from)
+        if end >= 0:
+            del buf[end + len(b"</script>"):]
+            break
+        scan_from = max(script_at, len(buf) - len(b"</script>"))
+
+    for _ in chunks:
+        pass
+
+    return buf
+
+
+def _dig(data, *keys, default=None):
+    """Follow `keys` into nested dicts; `default` if any level is missing or null."""
+    for key in keys:
+        if not isinstance(data, dict):
+            return default
+        data = data.get(key)
+    return default if data is None else data
+
+
+def extract_product_info(product_url: str, query: str):
+    """
+    Extract product data from a Walmart product page using __NEXT_DATA__ JSON.
+
+    The row is tagged with the search `query` that found it.
+    """
+    resp = http_get(product_url, stream=True)
+    try:
+        resp.raise_for_status()
+        content = read_next_data(resp)
+    finally:
+        resp.close()
 
-    if not script_tag or not script_tag.string:
+    match = _NEXT_DATA_RE.search(content)
+
+    if not match or not match.group(1).strip():
         raise ValueError("Could not find __NEXT_DATA__ script tag")
 
-    data = json.loads(script_tag.string)
-    initial_data = data["props"]["pageProps"]["initialData"]["data"]
-    product_data = initial_data["product"]
-    reviews_data = initial_data.get("reviews", {})
+    data = orjson.loads(match.group(1))
+    initial_data = _dig(data, "props", "pageProps", "initialData", "data", default=_EMPTY)
+    product_data = initial_data.get("product")
+    if not isinstance(product_data, dict):
+        raise ValueError("No product data in __NEXT_DATA__")
+    reviews_data = _dig(initial_data, "reviews", default=_EMPTY)
+
+    # Id, name and availability are what make it a product row; anything
+    # else missing (e.g. no current price) just leaves that field empty
+    item_id, name, availability = _get_product_core(product_data)
 
     product_info = {
-        "price": product_data["priceInfo"]["currentPrice"]["price"],
+        "price": _dig(product_data, "priceInfo", "currentPrice", "price"),
         "review_count": reviews_data.get("totalReviewCount", 0),
-        "item_id": product_data["usItemId"],
+        "item_id": item_id,
         "avg_rating": reviews_data.get("averageOverallRating", 0),
-        "product_name": product_data["name"],
+        "product_name": name,
         "brand": product_data.get("brand", ""),
-        "availability": product_data["availabilityStatus"],
-        "image_url": product_data["imageInfo"]["thumbnailUrl"],
+        "availability": availability,
+        "image_url": _dig(product_data, "imageInfo", "thumbnailUrl", default=""),
         "short_description": product_data.get("shortDescription", ""),
+        "search_query": query,
+        # jsonl_to_sqlite keys its one-row-per-day history on this
+        "scraped_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
     }
+    page_parsed(resp)
 
     return product_info
 
 
-def run_round(
-    queries,
+def fetch_product(product_url: str, query: str):
+    """
+    Worker-thread wrapper around extract_product_info.
+
+    Returns (product_url, product_info, error) instead of raising, so the
+    caller can do retry bookkeeping for each URL.
+    """
+    try:
+        product_info = extract_product_info(product_url, query)
+        error = None
+    except Exception as e:
+        product_info, error = None, e
+
+    return product_url, product_info, error
+
+
+def scrape_query(
+    query,
+    round_num: int,
+    executor,
     file,
-    seen_urls,
-    product_retry_counts,
-    failed_urls_final,
-    round_num: int
+    seen_file,
+    seen_ids: set[str],
+    product_retry_counts: dict[str, int],
+    failed_urls_final: set[str],
+    lock,
 ):
     """
-    Run one scraping round over the given list of queries.
+    Scrape every search page of one query.
 
-    Returns a list of queries that 'failed' at either:
-      - SEARCH level:
-          * 0 product links on page 1  (blocked / no results)
-          * HTTP/other exception when fetching search results
-      - PRODUCT level:
-          * At least one product URL failed but hasn't yet hit MAX_PRODUCT_RETRIES
+    Runs on a query worker thread; `lock` guards the shared dedup/retry
+    state and the output files. Returns True if the query should be
+    retried next round (search-level failure, or product URLs that
+    still have retry budget).
     """
-    failed_queries = []
+    # Config read once per query rather than as a global in the loops below
+    max_pages = MAX_PAGES_PER_QUERY
+    max_products = MAX_PRODUCTS_PER_QUERY
+    max_retries = MAX_PRODUCT_RETRIES
+
+    page_number = 1
+    products_for_query = 0
+    query_had_retryable_product_failures = False
+
+    print(f"\n=== [Round {round_num}] Searching for '{query}' ===")
+
+    search_base = search_base_url(query)
+    next_page = executor.submit(get_product_links, search_base, page_number)
+
+    while True:
+        # Only enforce a cap if MAX_PAGES_PER_QUERY is not None
+        if max_pages is not None and page_number > max_pages:
+            next_page.cancel()
+            print(f"Reached max pages cap ({max_pages}) for '{query}'")
+            break
+
+        # Get links for this query + page (requested while the previous
+        # page's products were being fetched)
+        try:
+            links = next_page.result()
+        except requests.HTTPError as e:
+            print(f"HTTP error for search '{query}' page {page_number}: {e}")
+            return True
+        except Exception as e:
+            print(f"Unexpected error for search '{query}' page {page_number}: {e}")
+            return True
+
+        # If page 1 has zero product links, treat as "no results" (or blocked) and log the query
+        if not links:
+            if page_number == 1:
+                print(
+                    f"No product links for '{query}' on page 1. "
+                    "No results or blocked; skipping this query."
+                )
+                return True
+            else:
+                print(f"No more results for '{query}' on page {page_number}")
+                break
 
-    for query in queries:
-        page_number = 1
-        products_for_query = 0
-        query_had_retryable_product_failures = False
+        print(f"Query '{query}', page {page_number}, found {len(links)} links")
+
+        # Start loading the next search page now so it overlaps with this
+        # page's product fetches; submitted first so it isn't queued behind them
+        if max_pages is None or page_number < max_pages:
+            next_page = executor.submit(get_product_links, search_base, page_number + 1)
+
+        # Skip items already successfully scraped OR URLs permanently given up on.
+        # Keyed by item id, so repeats of a product on this page collapse too.
+        new_links_by_id = {}
+        for link in links:
+            item_id = item_key(link)
+            if item_id in seen_ids or link in failed_urls_final:
+                continue
+            new_links_by_id.setdefault(item_id, link)
+        new_links = list(new_links_by_id.values())
+
+        # Only enforce a cap if MAX_PRODUCTS_PER_QUERY is not None
+        if max_products is not None:
+            remaining = max_products - products_for_query
+            if len(new_links) > remaining:
+                print(
+                    f"Reached max products cap ({max_products}) for '{query}'"
+                )
+                new_links = new_links[:remaining]
+
+        # Fetch product pages concurrently; map() keeps link order
+        results = list(executor.map(fetch_product, new_links, repeat(query)))
+
+        # Several queries run at once and share the dedup/retry state and
+        # the output files, so record this page's results under the lock
+        with lock:
+            scraped_ids = []
+            rows = bytearray()
+            for link, product_info, error in results:
+                if error is None:
+                    if product_info:
+                        item_id = item_key(link)
+                        if item_id in seen_ids:
+                            # Another query scraped this item in the meantime
+                            continue
 
-        print(f"\n=== [Round {round_num}] Searching for '{query}' ===")
+                        rows += orjson.dumps(product_info, option=orjson.OPT_APPEND_NEWLINE)
+                        products_for_query += 1
 
-        while True:
-            # Only enforce a cap if MAX_PAGES_PER_QUERY is not None
-            if MAX_PAGES_PER_QUERY is not None and page_number > MAX_PAGES_PER_QUERY:
-                print(f"Reached max pages cap ({MAX_PAGES_PER_QUERY}) for '{query}'")
-                break
+                        # Only mark as seen *after* success
+                        seen_ids.add(item_id)
+                        scraped_ids.append(item_id)
+                    continue
 
-            # Get links for this query + page
-            try:
-                links = get_product_links(query, page_number)
-            except requests.HTTPError as e:
-                print(f"HTTP error for search '{query}' page {page_number}: {e}")
-                failed_queries.append(query)
-                break
-            except Exception as e:
-                print(f"Unexpected error for search '{query}' page {page_number}: {e}")
-                failed_queries.append(query)
-                break
+                # URL-level failures shouldn't kill the query,
+                # but DO track them and possibly retry later.
+                print(f"Failed to process URL {link}. Error: {error}")
 
-            # If page 1 has zero product links, treat as "no results" (or blocked) and log the query
-            if not links:
-                if page_number == 1:
+                # Track retry counts for this product URL
+                current_count = product_retry_counts.get(link, 0) + 1
+                product_retry_counts[link] = current_count
+
+                if current_count >= max_retries:
+                    # Give up on this URL entirely
+                    failed_urls_final.add(link)
                     print(
-                        f"No product links for '{query}' on page 1. "
-                        "No results or blocked; skipping this query."
+                        f"Giving up on URL after {current_count} failures: {link}"
                     )
-                    failed_queries.append(query)
-                    break
                 else:
-                    print(f"No more results for '{query}' on page {page_number}")
-                    break
+                    # Still have retry budget → mark query to retry in another round
+                    query_had_retryable_product_failures = True
 
-            print(f"Query '{query}', page {page_number}, found {len(links)} links")
+            # Persist the page's products before recording their ids, so a crash
+            # never marks an item as seen without its row being on disk
+            if scraped_ids:
+                file.write(rows)
+                file.flush()
+                seen_file.write("".join(item_id + "\n" for item_id in scraped_ids))
+                seen_file.flush()
 
-            # Process each product link
-            for link in links:
-                # Skip URLs already successfully scraped OR permanently given up on
-                if link in seen_urls or link in failed_urls_final:
-                    continue
+        # If it hits the per-query product limit, stop paging this query
+        if max_products is not None and products_for_query >= max_products:
+            next_page.cancel()
+            break
 
-                # Only enforce a cap if MAX_PRODUCTS_PER_QUERY is not None
-                if (
-                    MAX_PRODUCTS_PER_QUERY is not None
-                    and products_for_query >= MAX_PRODUCTS_PER_QUERY
-                ):
-                    print(
-                        f"Reached max products cap ({MAX_PRODUCTS_PER_QUERY}) for '{query}'"
-                    )
-                    break
+        # Next search page for this query
+        page_number += 1
 
-                try:
-                    product_info = extract_product_info(link)
-                    if product_info:
-                        # Tag row with the query that found it
-                        product_info["search_query"] = query
-                        file.write(json.dumps(product_info, ensure_ascii=False) + "\n")
-                        products_for_query += 1
+    return query_had_retryable_product_failures
 
-                        # Only mark as seen *after* success
-                        seen_urls.add(link)
-
-                except Exception as e:
-                    # URL-level failures shouldn't kill the query,
-                    # but DO track them and possibly retry later.
-                    print(f"Failed to process URL {link}. Error: {e}")
-
-                    # Track retry counts for this product URL
-                    current_count = product_retry_counts.get(link, 0) + 1
-                    product_retry_counts[link] = current_count
-
-                    if current_count >= MAX_PRODUCT_RETRIES:
-                        # Give up on this URL entirely
-                        failed_urls_final.add(link)
-                        print(
-                            f"Giving up on URL after {current_count} failures: {link}"
-                        )
-                    else:
-                        # Still have retry budget → mark query to retry in another round
-                        query_had_retryable_product_failures = True
-
-                # Slight random delay between product requests
-                sleep_between(SLEEP_PRODUCT_MIN, SLEEP_PRODUCT_MAX)
-
-            # If it hits the per-query product limit, stop paging this query
-            if (
-                MAX_PRODUCTS_PER_QUERY is not None
-                and products_for_query >= MAX_PRODUCTS_PER_QUERY
-            ):
-                break
 
-            # Next search page for this query
-            page_number += 1
+def run_round(
+    queries,
+    executor,
+    file,
+    seen_file,
+    seen_ids: set[str],
+    product_retry_counts: dict[str, int],
+    failed_urls_final: set[str],
+    round_num: int
+):
+    """
+    Run one scraping round over the given list of queries, QUERY_WORKERS
+    queries at a time.
 
-            # Short delay between search result pages
-            sleep_between(SLEEP_PAGE_MIN, SLEEP_PAGE_MAX)
+    Returns a list of queries that 'failed' at either:
+      - SEARCH level:
+          * 0 product links on page 1  (blocked / no results)
+          * HTTP/other exception when fetching search results
+      - PRODUCT level:
+          * At least one product URL failed but hasn't yet hit MAX_PRODUCT_RETRIES
+    """
+    lock = threading.Lock()
+
+    def run_query(query):
+        return scrape_query(
+            query,
+            round_num,
+            executor,
+            file,
+            seen_file,
+            seen_ids,
+            product_retry_counts,
+            failed_urls_final,
+            lock,
+        )
 
-        # If this query had retryable product-level failures, schedule it for another round
-        if query_had_retryable_product_failures:
-            failed_queries.append(query)
+    with ThreadPoolExecutor(max_workers=QUERY_WORKERS) as query_executor:
+        results = query_executor.map(run_query, queries)
+        failed_queries = [query for query, failed in zip(queries, results) if failed]
 
-    # Deduplicate failed queries for this round
-    return sorted(set(failed_queries))
+    # Deduplicate failed queries for this round, keeping query order
+    return list(dict.fromkeys(failed_queries))
 
 
 # -------------- MAIN -------------- #
@@ -387,29 +626,44 @@ def main():
     # Output file: will always be appended to
     OUTPUT_FILE = "product_info.jsonl"
 
-    seen_urls = set()              # URLs successfully scraped
-    product_retry_counts = {}      # URL -> retry count
-    failed_urls_final = set()      # URLs permanently given up on
+    # Membership in these is checked for every product link; keep them
+    # sets/dicts so the checks stay O(1)
+    seen_ids: set[str] = load_seen_ids(SEEN_FILE)  # item ids successfully scraped (this + earlier runs today)
+    product_retry_counts: dict[str, int] = {}      # URL -> retry count
+    failed_urls_final: set[str] = set()            # URLs permanently given up on
 
-    # slice queries if you want smaller/faster runs
-    base_queries = GROCERY_QUERIES[QUERY_START:QUERY_END]
+    # slice queries if you want smaller/faster runs (GROCERY_QUERIES is a
+    # tuple, so the full run uses it as-is)
+    if QUERY_START == 0 and QUERY_END is None:
+        base_queries = GROCERY_QUERIES
+    else:
+        base_queries = GROCERY_QUERIES[QUERY_START:QUERY_END]
 
     print(f"Starting scrape with {len(base_queries)} base queries...")
+    print(f"Skipping {len(seen_ids)} items already scraped (from {SEEN_FILE})")
+
+    warm_up_session()
 
     remaining_failed = []
     round_num = 1
 
     # OPEN IN APPEND MODE to always add, never overwrite
-    with open(OUTPUT_FILE, "a", encoding="utf-8") as file:
+    with open(OUTPUT_FILE, "ab", buffering=1 << 20) as file, \
+            open(SEEN_FILE, "a", encoding="utf-8") as seen_file, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         current_queries = list(base_queries)
 
         while current_queries:
             print(f"\n##### ROUND {round_num} – {len(current_queries)} queries #####")
+            current_set = set(current_queries)
 
+            # run_round returns each failed query once, in query order
             failed_this_round = run_round(
                 current_queries,
+                executor,
                 file,
-                seen_urls,
+                seen_file,
+                seen_ids,
                 product_retry_counts,
                 failed_urls_final,
                 round_num,
@@ -420,22 +674,20 @@ def main():
                 remaining_failed = []
                 break
 
-            failed_set = sorted(set(failed_this_round))
-
             # If the set of failing queries does not shrink, stop retrying
-            if set(failed_set) == set(current_queries):
+            if set(failed_this_round) == current_set:
                 print("\nNo further progress on failing queries; stopping retries.")
-                remaining_failed = failed_set
+                remaining_failed = failed_this_round
                 break
 
             # Otherwise, retry only the queries that failed this round
             print(
-                f"\nWill retry {len(failed_set)} failed queries in the next round:"
+                f"\nWill retry {len(failed_this_round)} failed queries in the next round:"
             )
-            for q in failed_set:
+            for q in failed_this_round:
                 print(f" - {q}")
 
-            current_queries = failed_set
+            current_queries = failed_this_round
             round_num += 1
 
     print(f"\nScraping complete. Data written to {OUTPUT_FILE}")